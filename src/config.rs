@@ -1,6 +1,7 @@
 use config::{Config, ConfigError, Environment, File, FileFormat, Source};
 use serde::Deserialize;
-use std::collections::HashMap;
+use std::collections::{HashMap, HashSet};
+use std::time::SystemTime;
 
 #[derive(Debug, Deserialize, Clone)]
 pub struct SmConfigDefaults {
@@ -14,18 +15,71 @@ fn default_refresh() -> u64 {
     2000
 }
 
+#[derive(Debug, Clone)]
+pub struct SmChipConfig {
+    pub label: Option<String>,
+    pub visible: bool,
+    pub hidden_sensors: HashSet<String>,
+    pub sensor_labels: HashMap<String, String>,
+}
+
+const LABEL_KEY: &str = "label";
+const VISIBLE_KEY: &str = "visible";
+const HIDDEN_SENSORS_KEY: &str = "hidden_sensoers";
+
+impl SmChipConfig {
+    fn new(mut section: HashMap<String, String>) -> Self {
+        let label = section.remove(LABEL_KEY);
+
+        let visible = section
+            .remove(VISIBLE_KEY)
+            .and_then(|visible_str| visible_str.parse::<bool>().ok())
+            != Some(false);
+
+        let hidden_sensors = section
+            .remove(HIDDEN_SENSORS_KEY)
+            .map(|hidden_sensors_str| {
+                hidden_sensors_str
+                    .split(',')
+                    .map(str::trim)
+                    .filter(|sensor_id| !sensor_id.is_empty())
+                    .map(str::to_string)
+                    .collect()
+            })
+            .unwrap_or_default();
+
+        Self {
+            label,
+            visible,
+            hidden_sensors,
+            sensor_labels: section,
+        }
+    }
+}
+
 #[derive(Debug, Clone)]
 pub struct SmConfig {
     pub defaults: SmConfigDefaults,
-    pub sensors: HashMap<String, HashMap<String, String>>,
+    pub chips: HashMap<String, SmChipConfig>,
+}
+
+impl SmConfig {
+    pub fn new(
+        defaults: SmConfigDefaults,
+        sensors: HashMap<String, HashMap<String, String>>,
+    ) -> Self {
+        let chips = sensors
+            .into_iter()
+            .map(|(chip_id, section)| (chip_id, SmChipConfig::new(section)))
+            .collect();
+
+        Self { defaults, chips }
+    }
 }
 
 impl Default for SmConfig {
     fn default() -> Self {
-        Self {
-            defaults: Default::default(),
-            sensors: Default::default(),
-        }
+        Self::new(Default::default(), Default::default())
     }
 }
 
@@ -58,17 +112,14 @@ pub fn load_config(config_file: &Option<String>) -> Result<SmConfig, ConfigError
         .add_source(Environment::with_prefix("SM_"))
         .build()?;
 
-    let mut sm_config: SmConfig = SmConfig {
-        defaults: Default::default(),
-        sensors: Default::default(),
-    };
+    let mut defaults = SmConfigDefaults::default();
+    let mut sections = HashMap::new();
 
     if let Ok(config_table) = config.collect() {
-        let mut sections = HashMap::new();
         for (key, value) in config_table {
             if key == DEFAULTS_SECTION {
-                if let Ok(defaults) = value.try_deserialize::<SmConfigDefaults>() {
-                    sm_config.defaults = defaults;
+                if let Ok(section_defaults) = value.try_deserialize::<SmConfigDefaults>() {
+                    defaults = section_defaults;
                 }
             } else {
                 if let Ok(section_table) = value.into_table() {
@@ -80,8 +131,14 @@ pub fn load_config(config_file: &Option<String>) -> Result<SmConfig, ConfigError
                 }
             }
         }
-        sm_config.sensors = sections;
     }
 
-    Ok(sm_config)
+    Ok(SmConfig::new(defaults, sections))
+}
+
+pub fn get_config_modified(config_file: &Option<String>) -> Option<SystemTime> {
+    config_file
+        .as_ref()
+        .and_then(|file| std::fs::metadata(file).ok())
+        .and_then(|metadata| metadata.modified().ok())
 }
@@ -0,0 +1,247 @@
+use crate::sensors::NULL_DEVICE;
+use serde_json::{Map, Value};
+use std::ffi::{CStr, CString, c_char, c_double, c_int, c_short, c_uint, c_void};
+use std::ptr;
+
+const ADAPTER_PROP: &str = "Adapter";
+const CHIP_NAME_MAX_LEN: usize = 200;
+const SENSORS_MODE_R: c_uint = 1;
+
+#[repr(C)]
+struct SensorsBusId {
+    bus_type: c_short,
+    nr: c_short,
+}
+
+#[repr(C)]
+struct SensorsChipName {
+    prefix: *mut c_char,
+    bus: SensorsBusId,
+    addr: c_int,
+    path: *mut c_char,
+}
+
+#[repr(C)]
+struct SensorsFeature {
+    name: *mut c_char,
+    number: c_int,
+    feature_type: c_int,
+    first_subfeature: c_int,
+    padding1: c_int,
+}
+
+#[repr(C)]
+struct SensorsSubfeature {
+    name: *mut c_char,
+    number: c_int,
+    subfeature_type: c_int,
+    mapping: c_int,
+    flags: c_uint,
+}
+
+#[repr(C)]
+struct File {
+    _private: [u8; 0],
+}
+
+#[link(name = "sensors")]
+unsafe extern "C" {
+    fn sensors_init(input: *mut File) -> c_int;
+    fn sensors_cleanup();
+    fn sensors_strerror(errnum: c_int) -> *const c_char;
+    fn sensors_get_detected_chips(
+        chip_match: *const SensorsChipName,
+        nr: *mut c_int,
+    ) -> *const SensorsChipName;
+    fn sensors_snprintf_chip_name(
+        str: *mut c_char,
+        size: usize,
+        chip: *const SensorsChipName,
+    ) -> c_int;
+    fn sensors_get_adapter_name(bus: *const SensorsBusId) -> *const c_char;
+    fn sensors_get_features(name: *const SensorsChipName, nr: *mut c_int) -> *const SensorsFeature;
+    fn sensors_get_label(
+        name: *const SensorsChipName,
+        feature: *const SensorsFeature,
+    ) -> *mut c_char;
+    fn sensors_get_all_subfeatures(
+        name: *const SensorsChipName,
+        feature: *const SensorsFeature,
+        nr: *mut c_int,
+    ) -> *const SensorsSubfeature;
+    fn sensors_get_value(
+        name: *const SensorsChipName,
+        subfeat_nr: c_int,
+        value: *mut c_double,
+    ) -> c_int;
+}
+
+unsafe extern "C" {
+    fn fopen(path: *const c_char, mode: *const c_char) -> *mut File;
+    fn fclose(file: *mut File) -> c_int;
+    fn free(ptr: *mut c_void);
+}
+
+unsafe fn c_string(s: *const c_char) -> Option<String> {
+    if s.is_null() {
+        None
+    } else {
+        Some(unsafe { CStr::from_ptr(s) }.to_string_lossy().into_owned())
+    }
+}
+
+fn strerror(errnum: c_int) -> String {
+    unsafe { c_string(sensors_strerror(errnum)) }.unwrap_or_else(|| errnum.to_string())
+}
+
+fn chip_name(chip: &SensorsChipName) -> Option<String> {
+    let mut buf = [0 as c_char; CHIP_NAME_MAX_LEN];
+    if unsafe { sensors_snprintf_chip_name(buf.as_mut_ptr(), buf.len(), chip) } < 0 {
+        return None;
+    }
+    unsafe { c_string(buf.as_ptr()) }
+}
+
+struct Subfeature {
+    name: String,
+    number: c_int,
+}
+
+struct Feature {
+    label: String,
+    subfeatures: Vec<Subfeature>,
+}
+
+struct Chip {
+    id: String,
+    name: *const SensorsChipName,
+    adapter: Option<String>,
+    features: Vec<Feature>,
+}
+
+fn enumerate_chip(chip: &SensorsChipName, id: String) -> Chip {
+    let adapter = unsafe { c_string(sensors_get_adapter_name(&chip.bus)) };
+
+    let mut features = vec![];
+    let mut feature_nr: c_int = 0;
+    while let Some(feature) = unsafe { sensors_get_features(chip, &mut feature_nr).as_ref() } {
+        let label = unsafe { sensors_get_label(chip, feature) };
+        let Some(feature_label) = (unsafe { c_string(label) }) else {
+            continue;
+        };
+        unsafe { free(label.cast()) };
+
+        let mut subfeatures = vec![];
+        let mut subfeature_nr: c_int = 0;
+        while let Some(subfeature) =
+            unsafe { sensors_get_all_subfeatures(chip, feature, &mut subfeature_nr).as_ref() }
+        {
+            if subfeature.flags & SENSORS_MODE_R == 0 {
+                continue;
+            }
+            if let Some(name) = unsafe { c_string(subfeature.name) } {
+                subfeatures.push(Subfeature {
+                    name,
+                    number: subfeature.number,
+                });
+            }
+        }
+
+        features.push(Feature {
+            label: feature_label,
+            subfeatures,
+        });
+    }
+
+    Chip {
+        id,
+        name: chip,
+        adapter,
+        features,
+    }
+}
+
+impl Chip {
+    fn read(&self) -> Map<String, Value> {
+        let mut chip_data = Map::new();
+
+        if let Some(adapter) = &self.adapter {
+            chip_data.insert(ADAPTER_PROP.to_string(), Value::String(adapter.clone()));
+        }
+
+        for feature in &self.features {
+            let mut sensor_values = Map::new();
+            for subfeature in &feature.subfeatures {
+                let mut value: c_double = 0.0;
+                if unsafe { sensors_get_value(self.name, subfeature.number, &mut value) } != 0 {
+                    continue;
+                }
+                sensor_values.insert(subfeature.name.clone(), Value::from(value));
+            }
+
+            chip_data.insert(feature.label.clone(), Value::Object(sensor_values));
+        }
+
+        chip_data
+    }
+}
+
+/// Handle to the process-wide libsensors state, only one should exist at a time.
+pub struct LibSensors {
+    chips: Vec<Chip>,
+}
+
+// The chip names point into tables owned by libsensors, which stay valid until
+// sensors_cleanup runs in Drop.
+unsafe impl Send for LibSensors {}
+
+impl LibSensors {
+    pub fn new(lm_sensors_config: &Option<String>) -> Result<Self, Box<dyn std::error::Error>> {
+        let path = CString::new(lm_sensors_config.as_deref().unwrap_or(NULL_DEVICE))?;
+
+        let file = unsafe { fopen(path.as_ptr(), c"r".as_ptr()) };
+        if file.is_null() {
+            return Err(format!(
+                "Failed to open lm-sensors config file {}: {}",
+                path.to_string_lossy(),
+                std::io::Error::last_os_error()
+            )
+            .into());
+        }
+
+        let err = unsafe { sensors_init(file) };
+        unsafe { fclose(file) };
+
+        if err != 0 {
+            return Err(format!("Failed to initialize libsensors: {}", strerror(err)).into());
+        }
+
+        let mut chips = vec![];
+        let mut chip_nr: c_int = 0;
+        while let Some(chip) =
+            unsafe { sensors_get_detected_chips(ptr::null(), &mut chip_nr).as_ref() }
+        {
+            if let Some(chip_id) = chip_name(chip) {
+                chips.push(enumerate_chip(chip, chip_id));
+            }
+        }
+
+        Ok(LibSensors { chips })
+    }
+
+    pub fn read(&self) -> Value {
+        let mut sensors_json = Map::new();
+
+        for chip in &self.chips {
+            sensors_json.insert(chip.id.clone(), Value::Object(chip.read()));
+        }
+
+        Value::Object(sensors_json)
+    }
+}
+
+impl Drop for LibSensors {
+    fn drop(&mut self) {
+        unsafe { sensors_cleanup() }
+    }
+}
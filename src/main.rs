@@ -2,17 +2,19 @@ use crate::{cli::SmArgs, config::SmConfig};
 use clap::Parser;
 use color_eyre::Result;
 use crossterm::event::{
-    self, DisableMouseCapture, EnableMouseCapture, Event, KeyCode, KeyEventKind,
+    self, DisableMouseCapture, EnableMouseCapture, Event, KeyCode, KeyEventKind, KeyModifiers,
 };
 use crossterm::execute;
 use ratatui::DefaultTerminal;
 use std::{
     io::stdout,
-    time::{Duration, Instant},
+    time::{Duration, Instant, SystemTime, UNIX_EPOCH},
 };
 
 mod cli;
 mod config;
+#[cfg(feature = "libsensors")]
+mod libsensors;
 mod sensors;
 mod ui;
 
@@ -26,7 +28,7 @@ fn main() -> Result<(), Box<dyn std::error::Error>> {
     execute!(stdout, EnableMouseCapture)?;
 
     let terminal = ratatui::init();
-    let res = App::new(&args, &config).configure().run(terminal);
+    let res = App::new(&args, config).configure().run(terminal);
 
     ratatui::restore();
     execute!(stdout, DisableMouseCapture)?;
@@ -41,7 +43,10 @@ fn main() -> Result<(), Box<dyn std::error::Error>> {
 struct App<'a> {
     exit: bool,
     args: &'a SmArgs,
-    config: &'a SmConfig,
+    config: SmConfig,
+    config_modified: Option<SystemTime>,
+    config_error: Option<String>,
+    rescan_requested: bool,
     refresh_rate: Duration,
     lm_sensors_config: Option<String>,
     lm_sensors_json: Option<String>,
@@ -49,12 +54,22 @@ struct App<'a> {
 
 const TICK_RATE: u64 = 100;
 
+fn current_second() -> u64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|since_epoch| since_epoch.as_secs())
+        .unwrap_or_default()
+}
+
 impl<'a> App<'a> {
-    const fn new(args: &'a SmArgs, config: &'a SmConfig) -> Self {
+    const fn new(args: &'a SmArgs, config: SmConfig) -> Self {
         Self {
             exit: false,
             args,
             config,
+            config_modified: None,
+            config_error: None,
+            rescan_requested: false,
             refresh_rate: Duration::from_millis(0),
             lm_sensors_config: None,
             lm_sensors_json: None,
@@ -62,6 +77,8 @@ impl<'a> App<'a> {
     }
 
     fn configure(mut self) -> Self {
+        self.config_modified = config::get_config_modified(&self.args.config);
+
         self.refresh_rate =
             Duration::from_millis(self.args.refresh.unwrap_or(self.config.defaults.refresh));
 
@@ -83,34 +100,63 @@ impl<'a> App<'a> {
     fn run(mut self, mut terminal: DefaultTerminal) -> Result<(), Box<dyn std::error::Error>> {
         let tick_rate = Duration::from_millis(TICK_RATE);
 
+        let sensors_reader =
+            sensors::SensorsReader::new(&self.lm_sensors_config, &self.lm_sensors_json)?;
+
         let mut sensor_data = None;
+        let mut sensor_tables = None;
+        let mut last_raw_sensor_data = None;
+        let mut needs_redraw = true;
+        let mut last_draw_second = 0;
         let mut last_tick = Instant::now();
-        let mut last_refresh = Instant::now();
+
+        let sensors_worker = sensors_reader.spawn(self.refresh_rate.max(tick_rate));
 
         while self.is_running() {
-            if last_refresh.elapsed() >= self.refresh_rate || sensor_data.is_none() {
-                sensor_data = Some(sensors::get_data(
-                    &self.lm_sensors_config,
-                    &self.lm_sensors_json,
-                    self.config,
-                )?);
-
-                last_refresh = Instant::now();
+            if self.rescan_requested {
+                sensors_worker.rescan();
+                self.rescan_requested = false;
             }
 
-            if sensor_data.is_some() {
-                terminal.draw(|f| {
-                    f.render_widget(
-                        ui::SmUi::new(sensor_data.as_ref().unwrap(), &self.refresh_rate),
-                        f.area(),
-                    )
-                })?;
+            if let Ok(raw_sensor_data) = sensors_worker.readings.try_recv() {
+                let raw_sensor_data = raw_sensor_data?;
+
+                if self.reload_config_if_modified() {
+                    last_raw_sensor_data = None;
+                    sensors_worker.rescan();
+                }
+
+                if last_raw_sensor_data.as_ref() != Some(&raw_sensor_data) {
+                    let new_sensor_data = sensors::parse_data(&raw_sensor_data, &self.config)?;
+                    if sensor_data.as_ref() != Some(&new_sensor_data) {
+                        sensor_tables = Some(ui::SmTables::new(&new_sensor_data));
+                        sensor_data = Some(new_sensor_data);
+                        needs_redraw = true;
+                    }
+                    last_raw_sensor_data = Some(raw_sensor_data);
+                }
+            }
+
+            let draw_second = current_second();
+            if needs_redraw || draw_second != last_draw_second {
+                if let Some(tables) = &sensor_tables {
+                    terminal.draw(|f| {
+                        f.render_widget(
+                            ui::SmUi::new(tables, &self.refresh_rate, self.config_error.as_deref()),
+                            f.area(),
+                        )
+                    })?;
+
+                    needs_redraw = false;
+                    last_draw_second = draw_second;
+                }
             }
 
             let timeout = tick_rate.saturating_sub(last_tick.elapsed());
             if event::poll(timeout)? {
                 match event::read()? {
                     Event::Key(key) => self.handle_key_press(key),
+                    Event::Resize(_, _) => needs_redraw = true,
                     _ => (),
                 }
             }
@@ -122,12 +168,34 @@ impl<'a> App<'a> {
         Ok(())
     }
 
+    fn reload_config_if_modified(&mut self) -> bool {
+        let config_modified = config::get_config_modified(&self.args.config);
+        if config_modified == self.config_modified {
+            return false;
+        }
+
+        match config::load_config(&self.args.config) {
+            Ok(config) => {
+                self.config = config;
+                self.config_modified = config_modified;
+                self.config_error = None;
+                true
+            }
+            Err(e) => {
+                self.config_error = Some(e.to_string());
+                false
+            }
+        }
+    }
+
     fn handle_key_press(&mut self, key: event::KeyEvent) {
         if key.kind != KeyEventKind::Press {
             return;
         }
         match key.code {
-            KeyCode::Char('q') => self.quit(),
+            KeyCode::Char('q') | KeyCode::Esc => self.quit(),
+            KeyCode::Char('r') => self.rescan_requested = true,
+            KeyCode::Char('c') if key.modifiers.contains(KeyModifiers::CONTROL) => self.quit(),
             _ => {}
         }
     }
@@ -1,32 +1,29 @@
-use crate::config::SmConfig;
-use regex::Regex;
-use serde::Deserialize;
-use serde_json::Value;
-use std::collections::HashMap;
+use crate::config::{SmChipConfig, SmConfig};
+#[cfg(feature = "libsensors")]
+use crate::libsensors::LibSensors;
+use serde_json::{Map, Value};
 use std::io::ErrorKind;
 use std::process::Command;
+use std::rc::Rc;
+use std::sync::mpsc;
+use std::thread;
+use std::time::{Duration, Instant};
 
-const NULL_DEVICE: &str = "/dev/null";
+pub const NULL_DEVICE: &str = "/dev/null";
 
-#[derive(Debug, Deserialize, Clone)]
-#[allow(unused)]
+#[derive(Debug, Clone, PartialEq)]
 pub struct Temp {
-    pub chip_id: String,
-    pub chip_label: String,
-    pub sensor_label: String,
-    pub chip_order: i32,
+    pub chip_id: Rc<str>,
+    pub label: String,
     pub value: Option<f64>,
     pub high: Option<f64>,
     pub critical: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Clone)]
-#[allow(unused)]
+#[derive(Debug, Clone, PartialEq)]
 pub struct HddTemp {
-    pub chip_id: String,
-    pub chip_label: String,
-    pub sensor_label: String,
-    pub chip_order: i32,
+    pub chip_id: Rc<str>,
+    pub label: String,
     pub value: Option<f64>,
     pub high: Option<f64>,
     pub critical: Option<f64>,
@@ -34,30 +31,24 @@ pub struct HddTemp {
     pub highest: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Clone)]
-#[allow(unused)]
+#[derive(Debug, Clone, PartialEq)]
 pub struct Voltage {
-    pub chip_id: String,
-    pub chip_label: String,
-    pub sensor_label: String,
-    pub chip_order: i32,
+    pub chip_id: Rc<str>,
+    pub label: String,
     pub value: Option<f64>,
     pub min: Option<f64>,
     pub max: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Clone)]
-#[allow(unused)]
+#[derive(Debug, Clone, PartialEq)]
 pub struct FanSpeed {
-    pub chip_id: String,
-    pub chip_label: String,
-    pub sensor_label: String,
-    pub chip_order: i32,
+    pub chip_id: Rc<str>,
+    pub label: String,
     pub value: Option<f64>,
     pub min: Option<f64>,
 }
 
-#[derive(Debug, Deserialize, Clone)]
+#[derive(Debug, Clone, PartialEq)]
 pub struct SensorsData {
     pub volts: Vec<Voltage>,
     pub temps: Vec<Temp>,
@@ -66,60 +57,66 @@ pub struct SensorsData {
 }
 
 fn get_chip_order(chip_id: &str) -> i32 {
-    let chip_sort_order = [
-        (Regex::new("^coretemp-.*").unwrap(), 1),
-        (Regex::new("^drivetemp-.*").unwrap(), 2),
-        (Regex::new("^acpitz-.*").unwrap(), 3),
-    ];
-
-    for (key, value) in &chip_sort_order {
-        if key.is_match(chip_id) {
-            return *value;
-        }
+    let chip_type = chip_id.split_once('-').map(|(chip_type, _)| chip_type);
+
+    match chip_type {
+        Some("coretemp") => 1,
+        Some("drivetemp") => 2,
+        Some("nvme") => 3,
+        Some("acpitz") => 4,
+        _ => i32::MAX - 1,
     }
+}
 
-    i32::MAX - 1
+enum SensorKind {
+    Temp,
+    Fan,
+    Voltage,
 }
 
-fn get_custom_chip_label(chip_id: &str, config: &SmConfig) -> String {
-    config
-        .sensors
-        .get(chip_id)
-        .and_then(|chip_config| chip_config.get("label"))
-        .cloned()
-        .unwrap_or_else(|| chip_id.to_string())
+fn get_sensor_kind(sensor_name: &str) -> Option<SensorKind> {
+    if sensor_name.starts_with("temp") {
+        Some(SensorKind::Temp)
+    } else if sensor_name.starts_with("fan") {
+        Some(SensorKind::Fan)
+    } else if sensor_name.starts_with("in") {
+        Some(SensorKind::Voltage)
+    } else {
+        None
+    }
 }
 
-fn get_custom_sensor_label(chip_id: &str, sensor_id: &str, config: &SmConfig) -> String {
-    config
-        .sensors
-        .get(chip_id)
-        .and_then(|chip_config| chip_config.get(sensor_id))
-        .cloned()
-        .unwrap_or_else(|| sensor_id.to_string())
+fn get_custom_chip_label<'a>(chip_id: &'a str, chip_config: Option<&'a SmChipConfig>) -> &'a str {
+    chip_config
+        .and_then(|chip_config| chip_config.label.as_deref())
+        .unwrap_or(chip_id)
+}
+
+fn get_custom_sensor_label<'a>(
+    sensor_id: &'a str,
+    chip_config: Option<&'a SmChipConfig>,
+) -> &'a str {
+    chip_config
+        .and_then(|chip_config| chip_config.sensor_labels.get(sensor_id))
+        .map_or(sensor_id, String::as_str)
 }
 
 fn is_chip_visible(chip_id: &str, config: &SmConfig) -> bool {
     config
-        .sensors
+        .chips
         .get(chip_id)
-        .and_then(|chip_config| chip_config.get("visible"))
-        .and_then(|visible_str| visible_str.parse::<bool>().ok())
-        .unwrap_or(true)
+        .is_none_or(|chip_config| chip_config.visible)
 }
 
-fn is_sensor_visible(chip_id: &str, sensor_id: &str, config: &SmConfig) -> bool {
-    if let Some(hidden_sensors_str) = config
-        .sensors
-        .get(chip_id)
-        .and_then(|chip_config| chip_config.get("hidden_sensoers"))
-    {
-        let hidden_sensors: Vec<&str> = hidden_sensors_str.split(',').collect();
-        if hidden_sensors.contains(&sensor_id) {
-            return false;
-        }
-    }
-    true
+fn is_sensor_hidden(sensor_id: &str, chip_config: Option<&SmChipConfig>) -> bool {
+    chip_config.is_some_and(|chip_config| chip_config.hidden_sensors.contains(sensor_id))
+}
+
+fn sensor_readings(sensor_values: &Map<String, Value>) -> impl Iterator<Item = (&str, f64)> {
+    sensor_values.iter().map(|(name, value)| {
+        let suffix = name.rsplit_once('_').map_or("", |(_, suffix)| suffix);
+        (suffix, value.as_f64().unwrap())
+    })
 }
 
 fn parse_sensors_json(sensors_json: &Value, config: &SmConfig) -> SensorsData {
@@ -130,130 +127,134 @@ fn parse_sensors_json(sensors_json: &Value, config: &SmConfig) -> SensorsData {
         fans: vec![],
     };
 
-    if let Value::Object(sensors_json) = sensors_json {
-        for (chip_id, chip_data) in sensors_json {
-            if !is_chip_visible(chip_id, config) {
+    let Value::Object(sensors_json) = sensors_json else {
+        return output;
+    };
+
+    let mut chips: Vec<_> = sensors_json
+        .iter()
+        .filter(|(chip_id, _)| is_chip_visible(chip_id, config))
+        .filter_map(|(chip_id, chip_data)| match chip_data {
+            Value::Object(chip_data) => Some((get_chip_order(chip_id), chip_id, chip_data)),
+            _ => None,
+        })
+        .collect();
+    chips.sort_by_key(|(chip_order, _, _)| *chip_order);
+
+    for (_, chip_id, chip_data) in chips {
+        let chip_config = config.chips.get(chip_id);
+        let chip_label = get_custom_chip_label(chip_id, chip_config);
+        let shared_chip_id: Rc<str> = chip_id.as_str().into();
+        let is_drive_chip = chip_id.starts_with("drivetemp") || chip_id.starts_with("nvme");
+
+        for (sensor_id, sensor_values) in chip_data {
+            let Value::Object(sensor_values) = sensor_values else {
+                continue;
+            };
+
+            if is_sensor_hidden(sensor_id, chip_config) {
                 continue;
             }
-            if let Value::Object(chip_data) = chip_data {
-                for (sensor_id, sensor_values) in chip_data {
-                    if let Value::Object(sensor_values) = sensor_values {
-                        if !is_sensor_visible(chip_id, sensor_id, config) {
-                            continue;
-                        }
 
-                        let mut temps: HashMap<String, Temp> = HashMap::new();
-                        let mut hdd_temps: HashMap<String, HddTemp> = HashMap::new();
-                        let mut volts: HashMap<String, Voltage> = HashMap::new();
-                        let mut fans: HashMap<String, FanSpeed> = HashMap::new();
-
-                        for (name, value) in sensor_values {
-                            let value = value.as_f64().unwrap();
-                            if name.starts_with("temp") {
-                                if chip_id.starts_with("drivetemp") || chip_id.starts_with("nvme") {
-                                    let entry =
-                                        hdd_temps.entry(sensor_id.clone()).or_insert(HddTemp {
-                                            chip_id: chip_id.clone(),
-                                            chip_label: get_custom_chip_label(chip_id, config),
-                                            sensor_label: get_custom_sensor_label(
-                                                chip_id, sensor_id, config,
-                                            ),
-                                            chip_order: get_chip_order(chip_id),
-                                            value: None,
-                                            high: None,
-                                            critical: None,
-                                            lowest: None,
-                                            highest: None,
-                                        });
-                                    if name.ends_with("_input") {
-                                        entry.value = Some(value);
-                                    } else if name.ends_with("_max") {
-                                        entry.high = Some(value);
-                                    } else if name.ends_with("_crit") {
-                                        entry.critical = Some(value);
-                                    } else if name.ends_with("_lowest") {
-                                        entry.lowest = Some(value);
-                                    } else if name.ends_with("_highest") {
-                                        entry.highest = Some(value);
-                                    }
-                                } else {
-                                    let entry = temps.entry(sensor_id.clone()).or_insert(Temp {
-                                        chip_id: chip_id.clone(),
-                                        chip_label: get_custom_chip_label(chip_id, config),
-                                        sensor_label: get_custom_sensor_label(
-                                            chip_id, sensor_id, config,
-                                        ),
-                                        chip_order: get_chip_order(chip_id),
-                                        value: None,
-                                        high: None,
-                                        critical: None,
-                                    });
-                                    if name.ends_with("_input") {
-                                        entry.value = Some(value);
-                                    } else if name.ends_with("_max") {
-                                        entry.high = Some(value);
-                                    } else if name.ends_with("_crit") {
-                                        entry.critical = Some(value);
-                                    }
-                                }
-                            } else if name.starts_with("fan") {
-                                let entry = fans.entry(sensor_id.clone()).or_insert(FanSpeed {
-                                    chip_id: chip_id.clone(),
-                                    chip_label: get_custom_chip_label(chip_id, config),
-                                    sensor_label: get_custom_sensor_label(
-                                        chip_id, sensor_id, config,
-                                    ),
-                                    chip_order: get_chip_order(chip_id),
-                                    value: None,
-                                    min: None,
-                                });
-                                if name.ends_with("_input") {
-                                    entry.value = Some(value);
-                                } else if name.ends_with("_min") {
-                                    entry.min = Some(value);
-                                }
-                            } else if name.starts_with("in") {
-                                let entry = volts.entry(sensor_id.clone()).or_insert(Voltage {
-                                    chip_id: chip_id.clone(),
-                                    chip_label: get_custom_chip_label(chip_id, config),
-                                    sensor_label: get_custom_sensor_label(
-                                        chip_id, sensor_id, config,
-                                    ),
-                                    chip_order: get_chip_order(chip_id),
-                                    value: None,
-                                    min: None,
-                                    max: None,
-                                });
-                                if name.ends_with("_input") {
-                                    entry.value = Some(value);
-                                } else if name.ends_with("_min") {
-                                    entry.min = Some(value);
-                                } else if name.ends_with("_max") {
-                                    entry.max = Some(value);
-                                }
-                            }
+            let Some(sensor_kind) = sensor_values
+                .keys()
+                .next()
+                .and_then(|first_name| get_sensor_kind(first_name))
+            else {
+                continue;
+            };
+
+            let label = format!(
+                "{} {}",
+                chip_label,
+                get_custom_sensor_label(sensor_id, chip_config)
+            );
+
+            match sensor_kind {
+                SensorKind::Temp if is_drive_chip => {
+                    let mut hdd_temp = HddTemp {
+                        chip_id: shared_chip_id.clone(),
+                        label,
+                        value: None,
+                        high: None,
+                        critical: None,
+                        lowest: None,
+                        highest: None,
+                    };
+                    for (suffix, value) in sensor_readings(sensor_values) {
+                        match suffix {
+                            "input" => hdd_temp.value = Some(value),
+                            "max" => hdd_temp.high = Some(value),
+                            "crit" => hdd_temp.critical = Some(value),
+                            "lowest" => hdd_temp.lowest = Some(value),
+                            "highest" => hdd_temp.highest = Some(value),
+                            _ => {}
+                        }
+                    }
+                    output.hdd_temps.push(hdd_temp);
+                }
+                SensorKind::Temp => {
+                    let mut temp = Temp {
+                        chip_id: shared_chip_id.clone(),
+                        label,
+                        value: None,
+                        high: None,
+                        critical: None,
+                    };
+                    for (suffix, value) in sensor_readings(sensor_values) {
+                        match suffix {
+                            "input" => temp.value = Some(value),
+                            "max" => temp.high = Some(value),
+                            "crit" => temp.critical = Some(value),
+                            _ => {}
+                        }
+                    }
+                    output.temps.push(temp);
+                }
+                SensorKind::Fan => {
+                    let mut fan = FanSpeed {
+                        chip_id: shared_chip_id.clone(),
+                        label,
+                        value: None,
+                        min: None,
+                    };
+                    for (suffix, value) in sensor_readings(sensor_values) {
+                        match suffix {
+                            "input" => fan.value = Some(value),
+                            "min" => fan.min = Some(value),
+                            _ => {}
                         }
-                        output.temps.extend(temps.into_values());
-                        output.hdd_temps.extend(hdd_temps.into_values());
-                        output.volts.extend(volts.into_values());
-                        output.fans.extend(fans.into_values());
                     }
+                    output.fans.push(fan);
+                }
+                SensorKind::Voltage => {
+                    let mut volt = Voltage {
+                        chip_id: shared_chip_id.clone(),
+                        label,
+                        value: None,
+                        min: None,
+                        max: None,
+                    };
+                    for (suffix, value) in sensor_readings(sensor_values) {
+                        match suffix {
+                            "input" => volt.value = Some(value),
+                            "min" => volt.min = Some(value),
+                            "max" => volt.max = Some(value),
+                            _ => {}
+                        }
+                    }
+                    output.volts.push(volt);
                 }
             }
         }
     }
 
-    output.temps.sort_by_key(|item| item.chip_order);
-    output.hdd_temps.sort_by_key(|item| item.chip_order);
-    output.volts.sort_by_key(|item| item.chip_order);
-    output.fans.sort_by_key(|item| item.chip_order);
-
     output
 }
 
 fn get_sensors_data_from_command(
     lm_sensors_config: &Option<String>,
-) -> Result<Value, Box<dyn std::error::Error>> {
+) -> Result<Vec<u8>, Box<dyn std::error::Error>> {
     let output = match Command::new("sensors")
         .args([
             "-c",
@@ -283,29 +284,254 @@ fn get_sensors_data_from_command(
         .into());
     }
 
-    let stdout = String::from_utf8(output.stdout)?;
-    let data: Value = serde_json::from_str(&stdout)?;
-    Ok(data)
+    Ok(output.stdout)
 }
 
-fn get_sensors_data_from_file(path: &str) -> Result<Value, Box<dyn std::error::Error>> {
-    let content = std::fs::read_to_string(path)?;
-    let data: Value = serde_json::from_str(&content)?;
-    Ok(data)
+fn get_sensors_data_from_file(path: &str) -> Result<Vec<u8>, Box<dyn std::error::Error>> {
+    let content = std::fs::read(path)?;
+    Ok(content)
 }
 
-pub fn get_data(
-    lm_sensors_config: &Option<String>,
-    lm_sensors_json: &Option<String>,
+#[derive(Debug, PartialEq)]
+pub enum RawSensorsData {
+    Json(Vec<u8>),
+    #[cfg(feature = "libsensors")]
+    Tree(Value),
+}
+
+pub struct SensorsReader {
+    lm_sensors_config: Option<String>,
+    lm_sensors_json: Option<String>,
+    #[cfg(feature = "libsensors")]
+    library: Option<LibSensors>,
+}
+
+impl SensorsReader {
+    pub fn new(
+        lm_sensors_config: &Option<String>,
+        lm_sensors_json: &Option<String>,
+    ) -> Result<Self, Box<dyn std::error::Error>> {
+        Ok(Self {
+            lm_sensors_config: lm_sensors_config.clone(),
+            lm_sensors_json: lm_sensors_json.clone(),
+            #[cfg(feature = "libsensors")]
+            library: match lm_sensors_json {
+                Some(_) => None,
+                None => Some(LibSensors::new(lm_sensors_config)?),
+            },
+        })
+    }
+
+    pub fn read(&self) -> Result<RawSensorsData, Box<dyn std::error::Error>> {
+        if let Some(path) = &self.lm_sensors_json {
+            return Ok(RawSensorsData::Json(get_sensors_data_from_file(path)?));
+        }
+
+        #[cfg(feature = "libsensors")]
+        if let Some(library) = &self.library {
+            return Ok(RawSensorsData::Tree(library.read()));
+        }
+
+        Ok(RawSensorsData::Json(get_sensors_data_from_command(
+            &self.lm_sensors_config,
+        )?))
+    }
+
+    pub fn rescan(&mut self) -> Result<(), Box<dyn std::error::Error>> {
+        #[cfg(feature = "libsensors")]
+        if self.lm_sensors_json.is_none() {
+            self.library = None;
+            self.library = Some(LibSensors::new(&self.lm_sensors_config)?);
+        }
+
+        Ok(())
+    }
+
+    pub fn spawn(mut self, refresh_rate: Duration) -> SensorsWorker {
+        let (sender, readings) = mpsc::sync_channel(1);
+        let (rescan_sender, rescan_requests) = mpsc::channel();
+
+        thread::spawn(move || {
+            loop {
+                let started = Instant::now();
+                let raw_sensor_data = if rescan_requests.try_iter().count() > 0 {
+                    self.rescan().and_then(|()| self.read())
+                } else {
+                    self.read()
+                };
+
+                if sender
+                    .send(raw_sensor_data.map_err(|e| e.to_string()))
+                    .is_err()
+                {
+                    break;
+                }
+
+                thread::sleep(refresh_rate.saturating_sub(started.elapsed()));
+            }
+        });
+
+        SensorsWorker {
+            readings,
+            rescan_sender,
+        }
+    }
+}
+
+pub struct SensorsWorker {
+    pub readings: mpsc::Receiver<Result<RawSensorsData, String>>,
+    rescan_sender: mpsc::Sender<()>,
+}
+
+impl SensorsWorker {
+    pub fn rescan(&self) {
+        let _ = self.rescan_sender.send(());
+    }
+}
+
+pub fn parse_data(
+    raw_sensor_data: &RawSensorsData,
     config: &SmConfig,
 ) -> Result<SensorsData, Box<dyn std::error::Error>> {
-    let raw_sensor_data = if let Some(path) = lm_sensors_json {
-        get_sensors_data_from_file(path)?
-    } else {
-        get_sensors_data_from_command(lm_sensors_config)?
+    let sensor_data = match raw_sensor_data {
+        RawSensorsData::Json(json) => {
+            let sensors_json: Value = serde_json::from_slice(json)?;
+            parse_sensors_json(&sensors_json, config)
+        }
+        #[cfg(feature = "libsensors")]
+        RawSensorsData::Tree(sensors_json) => parse_sensors_json(sensors_json, config),
     };
 
-    let sensor_data = parse_sensors_json(&raw_sensor_data, config);
-
     Ok(sensor_data)
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::config::load_config;
+
+    fn fixture(name: &str) -> String {
+        format!("{}/testing/{}", env!("CARGO_MANIFEST_DIR"), name)
+    }
+
+    fn odroid_config() -> SmConfig {
+        load_config(&Some(fixture("sensors-monitor-odroid-test.conf"))).unwrap()
+    }
+
+    fn parse_fixture(name: &str, config: &SmConfig) -> SensorsData {
+        let raw_sensor_data = RawSensorsData::Json(std::fs::read(fixture(name)).unwrap());
+        parse_data(&raw_sensor_data, config).unwrap()
+    }
+
+    fn labels<'a, T>(sensors: &'a [T], label: fn(&T) -> &str) -> Vec<&'a str> {
+        sensors.iter().map(label).collect()
+    }
+
+    #[test]
+    fn orders_chips_by_type_without_config() {
+        let data = parse_fixture("sensors.json", &SmConfig::default());
+
+        assert_eq!(
+            labels(&data.temps, |temp| &temp.label),
+            [
+                "coretemp-isa-0000 Core 0",
+                "coretemp-isa-0000 Core 1",
+                "coretemp-isa-0000 Core 2",
+                "coretemp-isa-0000 Core 3",
+                "coretemp-isa-0000 Package id 0",
+                "acpitz-acpi-0 temp1",
+                "it8686-isa-0a30 temp1",
+                "it8686-isa-0a30 temp2",
+                "it8686-isa-0a30 temp3",
+            ]
+        );
+        assert_eq!(
+            labels(&data.hdd_temps, |temp| &temp.label),
+            [
+                "drivetemp-scsi-0-0 temp1",
+                "drivetemp-scsi-1-0 temp1",
+                "nvme-pci-0300 Composite",
+                "nvme-pci-0300 Sensor 1",
+                "nvme-pci-0300 Sensor 2",
+            ]
+        );
+        assert_eq!(
+            labels(&data.fans, |fan| &fan.label),
+            [
+                "it8686-isa-0a30 fan1",
+                "it8686-isa-0a30 fan2",
+                "it8686-isa-0a30 fan3",
+                "it8686-isa-0a30 fan4",
+                "it8686-isa-0a30 fan5",
+            ]
+        );
+        assert_eq!(data.volts.len(), 11);
+    }
+
+    #[test]
+    fn applies_custom_labels_from_config() {
+        let data = parse_fixture("sensors.json", &odroid_config());
+
+        assert_eq!(
+            labels(&data.temps, |temp| &temp.label),
+            [
+                "CPU Core 1",
+                "CPU Core 2",
+                "CPU Core 3",
+                "CPU Core 4",
+                "CPU Package",
+                "M/B CPU",
+                "it8686-isa-0a30 temp1",
+                "it8686-isa-0a30 temp2",
+                "it8686-isa-0a30 temp3",
+            ]
+        );
+        assert_eq!(
+            labels(&data.hdd_temps, |temp| &temp.label),
+            [
+                "Seagate ST2000DM008 ",
+                "WDC WD40EFRX ",
+                "WD Blue SN580 1TB Composite",
+                "WD Blue SN580 1TB Controller",
+                "WD Blue SN580 1TB NAND",
+            ]
+        );
+    }
+
+    #[test]
+    fn skips_invisible_chips_and_hidden_sensors() {
+        let data = parse_fixture("sensors-1.json", &odroid_config());
+
+        assert_eq!(
+            labels(&data.temps, |temp| &temp.label),
+            [
+                "CPU Core 1",
+                "CPU Core 2",
+                "CPU Core 3",
+                "CPU Core 4",
+                "CPU Package",
+                "M/B CPU",
+                "M/B System",
+                "r8169_0_100:00-mdio-0 temp1",
+            ]
+        );
+        assert_eq!(
+            labels(&data.fans, |fan| &fan.label),
+            ["M/B SYS Fan 1", "M/B SYS Fan 2"]
+        );
+        assert_eq!(
+            labels(&data.volts, |volt| &volt.label),
+            [
+                "M/B +3.3V",
+                "M/B 3VSB",
+                "M/B Vbat",
+                "M/B Vcore",
+                "M/B +3.3V",
+                "M/B +12.0V",
+                "M/B VSOC",
+                "M/B VDDP",
+                "M/B Intrusion",
+            ]
+        );
+    }
+}
@@ -10,45 +10,52 @@ use std::time::Duration;
 
 #[derive(Debug, Clone)]
 pub struct SmUi<'a> {
-    data: &'a sensors::SensorsData,
+    tables: &'a SmTables,
     refresh_rate: &'a Duration,
+    config_error: Option<&'a str>,
 }
 
-fn get_colored_temp(temp: &Option<f64>, high: &Option<f64>) -> Cell<'static> {
+#[derive(Debug, Clone)]
+pub struct SmTables {
+    temps: Option<Table<'static>>,
+    fans: Option<Table<'static>>,
+    hdd_temps: Option<Table<'static>>,
+    volts: Option<Table<'static>>,
+}
+
+const NORMAL_VALUE_STYLE: Style = Style::new()
+    .fg(Color::LightGreen)
+    .add_modifier(Modifier::BOLD);
+const WARNING_VALUE_STYLE: Style = Style::new().fg(Color::Yellow).add_modifier(Modifier::BOLD);
+const ALERT_VALUE_STYLE: Style = Style::new().fg(Color::Red).add_modifier(Modifier::BOLD);
+
+fn get_temp_style(temp: &Option<f64>, high: &Option<f64>) -> Style {
     let temp_val = temp.unwrap_or_else(|| 0.0);
 
     let high_val = high.unwrap_or(f64::MAX);
 
-    let style = if temp_val >= high_val * 0.8 {
-        Style::default().fg(Color::Red).bold()
+    if temp_val >= high_val * 0.8 {
+        ALERT_VALUE_STYLE
     } else if temp_val >= high_val * 0.6 {
-        Style::default().fg(Color::Yellow).bold()
+        WARNING_VALUE_STYLE
     } else {
-        Style::default().fg(Color::LightGreen).bold()
-    };
-
-    cell_current_value(val_temp(temp)).style(style)
+        NORMAL_VALUE_STYLE
+    }
 }
 
-fn get_colored_voltage(
-    voltage: &Option<f64>,
-    min: &Option<f64>,
-    max: &Option<f64>,
-) -> Cell<'static> {
+fn get_voltage_style(voltage: &Option<f64>, min: &Option<f64>, max: &Option<f64>) -> Style {
     let voltage_val = voltage.unwrap_or_else(|| 0.0);
 
     let min_val = min.unwrap_or(f64::MIN);
     let max_val = max.unwrap_or(f64::MAX);
 
-    let style = if voltage_val < min_val {
-        Style::default().fg(Color::Yellow).bold()
+    if voltage_val < min_val {
+        WARNING_VALUE_STYLE
     } else if voltage_val > max_val {
-        Style::default().fg(Color::Red).bold()
+        ALERT_VALUE_STYLE
     } else {
-        Style::default().fg(Color::LightGreen).bold()
-    };
-
-    cell_current_value(val_volts(voltage)).style(style)
+        NORMAL_VALUE_STYLE
+    }
 }
 
 fn fmt_rpm(v: f64) -> String {
@@ -62,34 +69,39 @@ fn fmt_volts(v: f64) -> String {
     format!("{:.2}V", v)
 }
 
-fn val_volts(val: &Option<f64>) -> String {
-    val.map(|v| fmt_volts(v)).unwrap_or_else(|| "".to_string())
+fn val_volts(val: &Option<f64>) -> Option<String> {
+    val.map(fmt_volts)
 }
 
-fn val_rpm(val: &Option<f64>) -> String {
-    val.map(|v| fmt_rpm(v)).unwrap_or_else(|| "".to_string())
+fn val_rpm(val: &Option<f64>) -> Option<String> {
+    val.map(fmt_rpm)
 }
 
-fn val_temp(val: &Option<f64>) -> String {
-    val.map(|v| fmt_temp(v)).unwrap_or_else(|| "".to_string())
+fn val_temp(val: &Option<f64>) -> Option<String> {
+    val.map(fmt_temp)
 }
 
-fn header_cell(s: String) -> Cell<'static> {
+fn header_cell(s: &'static str) -> Cell<'static> {
     Cell::from(Text::from(s).fg(Color::White).left_aligned()).bold()
 }
 
 fn cell_value(s: String) -> Cell<'static> {
     Cell::from(Text::from(s).left_aligned()).fg(Color::White)
 }
-fn cell_current_value(s: String) -> Cell<'static> {
-    cell_value(s).fg(Color::LightGreen).bold()
+
+fn cell_reading(value: Option<String>) -> Cell<'static> {
+    value.map(cell_value).unwrap_or_default()
 }
 
-fn cell_chip(chip_label: String, sensor_label: String) -> Cell<'static> {
-    cell_value(format!("{} {}", chip_label, sensor_label)).fg(Color::LightBlue)
+fn cell_chip(label: String) -> Cell<'static> {
+    cell_value(label).fg(Color::LightBlue)
 }
 
-fn row_margin_top(last_chip_id: &Option<String>, chip_id: &String) -> u16 {
+fn header_row<const N: usize>(cells: [Cell<'static>; N]) -> Row<'static> {
+    Row::new(cells).height(1).bottom_margin(1)
+}
+
+fn row_margin_top(last_chip_id: Option<&str>, chip_id: &str) -> u16 {
     match last_chip_id {
         Some(last_chip_id) => {
             if last_chip_id != chip_id {
@@ -102,12 +114,179 @@ fn row_margin_top(last_chip_id: &Option<String>, chip_id: &String) -> u16 {
     }
 }
 
+fn with_margin_top<'a, T>(
+    items: &'a [T],
+    chip_id: fn(&T) -> &str,
+) -> impl Iterator<Item = (u16, &'a T)> {
+    items
+        .iter()
+        .scan(None, move |last_chip_id: &mut Option<&'a str>, item| {
+            let margin_top = row_margin_top(*last_chip_id, chip_id(item));
+            *last_chip_id = Some(chip_id(item));
+            Some((margin_top, item))
+        })
+}
+
+fn sensor_row(
+    top_margin: u16,
+    label: String,
+    current: Option<String>,
+    current_style: Style,
+    limits: impl IntoIterator<Item = Option<String>>,
+) -> Row<'static> {
+    let cells = [cell_chip(label), cell_reading(current).style(current_style)];
+    let limit_cells = limits.into_iter().map(|limit| cell_reading(limit).dim());
+
+    Row::new(cells.into_iter().chain(limit_cells)).top_margin(top_margin)
+}
+
+fn sensors_table<const N: usize>(
+    rows: Vec<Row<'static>>,
+    header: Row<'static>,
+    widths: [Constraint; N],
+) -> Option<Table<'static>> {
+    if rows.is_empty() {
+        return None;
+    }
+
+    Some(
+        Table::new(rows, widths)
+            .header(header)
+            .column_spacing(TABLE_COLUMN_SPACING),
+    )
+}
+
+impl SmTables {
+    pub fn new(data: &sensors::SensorsData) -> Self {
+        let temps = with_margin_top(&data.temps, |temp| &temp.chip_id)
+            .map(|(top_margin, temp)| {
+                sensor_row(
+                    top_margin,
+                    temp.label.clone(),
+                    val_temp(&temp.value),
+                    get_temp_style(&temp.value, &temp.high),
+                    [val_temp(&temp.high), val_temp(&temp.critical)],
+                )
+            })
+            .collect();
+
+        let fans = with_margin_top(&data.fans, |fan| &fan.chip_id)
+            .map(|(top_margin, fan)| {
+                sensor_row(
+                    top_margin,
+                    fan.label.clone(),
+                    val_rpm(&fan.value),
+                    NORMAL_VALUE_STYLE,
+                    [val_rpm(&fan.min)],
+                )
+            })
+            .collect();
+
+        let hdd_temps = data
+            .hdd_temps
+            .iter()
+            .map(|temp| {
+                sensor_row(
+                    0,
+                    temp.label.clone(),
+                    val_temp(&temp.value),
+                    get_temp_style(&temp.value, &temp.high),
+                    [
+                        val_temp(&temp.high),
+                        val_temp(&temp.critical),
+                        val_temp(&temp.lowest),
+                        val_temp(&temp.highest),
+                    ],
+                )
+            })
+            .collect();
+
+        let volts = with_margin_top(&data.volts, |volt| &volt.chip_id)
+            .map(|(top_margin, volt)| {
+                sensor_row(
+                    top_margin,
+                    volt.label.clone(),
+                    val_volts(&volt.value),
+                    get_voltage_style(&volt.value, &volt.min, &volt.max),
+                    [val_volts(&volt.min), val_volts(&volt.max)],
+                )
+            })
+            .collect();
+
+        SmTables {
+            temps: sensors_table(
+                temps,
+                header_row([
+                    header_cell("Chip / Sensor"),
+                    header_cell("Current"),
+                    header_cell("High").dim(),
+                    header_cell("Critical").dim(),
+                ]),
+                [Fill(2), Fill(1), Fill(1), Fill(1)],
+            ),
+            fans: sensors_table(
+                fans,
+                header_row([
+                    header_cell("Fan"),
+                    header_cell("Current"),
+                    header_cell("Min").dim(),
+                ]),
+                [Fill(2), Fill(1), Fill(1)],
+            ),
+            hdd_temps: sensors_table(
+                hdd_temps,
+                header_row([
+                    header_cell("Drive"),
+                    header_cell("Current"),
+                    header_cell("High").dim(),
+                    header_cell("Critical").dim(),
+                    header_cell("Lowest").dim(),
+                    header_cell("Highest").dim(),
+                ]),
+                [Fill(3), Fill(1), Fill(1), Fill(1), Fill(1), Fill(1)],
+            ),
+            volts: sensors_table(
+                volts,
+                header_row([
+                    header_cell("Chip / Sensor"),
+                    header_cell("Current"),
+                    header_cell("Min").dim(),
+                    header_cell("Max").dim(),
+                ]),
+                [Fill(2), Fill(1), Fill(1), Fill(1)],
+            ),
+        }
+    }
+}
+
 const TABLE_BLOCK_PADDING: Padding = Padding::symmetric(2, 1);
 const TABLE_COLUMN_SPACING: u16 = 2;
 
+fn table_block(title: &'static str) -> Block<'static> {
+    Block::bordered()
+        .padding(TABLE_BLOCK_PADDING)
+        .title(Line::from(title).fg(Color::Cyan).bold())
+}
+
+fn draw_table(area: Rect, buf: &mut Buffer, block: Block<'_>, table: Option<&Table<'_>>) {
+    let table_area = block.inner(area);
+    Widget::render(block, area, buf);
+
+    if let Some(table) = table {
+        Widget::render(table, table_area, buf);
+    }
+}
+
 impl<'a> Widget for SmUi<'a> {
     fn render(self, area: Rect, buf: &mut Buffer) {
-        let main_block = Block::default().padding(Padding::symmetric(2, 1));
+        let mut main_block = Block::default().padding(Padding::symmetric(2, 1));
+        if let Some(config_error) = self.config_error {
+            main_block = main_block.title_bottom(
+                Line::from(format!(" Config not reloaded: {} ", config_error))
+                    .red()
+                    .bold(),
+            );
+        }
 
         let [top_area, bottom_area] = Layout::vertical([Fill(1), Fill(1)])
             .spacing(1)
@@ -121,20 +300,17 @@ impl<'a> Widget for SmUi<'a> {
             .spacing(1)
             .areas(bottom_area);
 
-        self.draw_system_temperatures(
+        draw_table(
             top_left_area,
             buf,
-            Block::bordered()
-                .padding(TABLE_BLOCK_PADDING)
-                .title(Line::from(" System Temperatures ").fg(Color::Cyan).bold()),
+            table_block(" System Temperatures "),
+            self.tables.temps.as_ref(),
         );
 
-        self.draw_fans_table(
+        draw_table(
             top_right_area,
             buf,
-            Block::bordered()
-                .padding(TABLE_BLOCK_PADDING)
-                .title(Line::from(" Fans ").fg(Color::Cyan).bold())
+            table_block(" Fans ")
                 .title(
                     Line::from(format!("[{}]", format_duration(*self.refresh_rate)))
                         .right_aligned(),
@@ -150,22 +326,21 @@ impl<'a> Widget for SmUi<'a> {
                     ))
                     .right_aligned(),
                 ),
+            self.tables.fans.as_ref(),
         );
 
-        self.draw_hdd_temp_table(
+        draw_table(
             bottom_left_area,
             buf,
-            Block::bordered()
-                .padding(TABLE_BLOCK_PADDING)
-                .title(Line::from(" Drives Temperatures ").fg(Color::Cyan).bold()),
+            table_block(" Drives Temperatures "),
+            self.tables.hdd_temps.as_ref(),
         );
 
-        self.draw_voltage_table(
+        draw_table(
             bottom_right_area,
             buf,
-            Block::bordered()
-                .padding(TABLE_BLOCK_PADDING)
-                .title(Line::from(" Voltages ").fg(Color::Cyan).bold()),
+            table_block(" Voltages "),
+            self.tables.volts.as_ref(),
         );
 
         main_block.render(area, buf);
@@ -173,165 +348,15 @@ impl<'a> Widget for SmUi<'a> {
 }
 
 impl<'a> SmUi<'a> {
-    pub fn new(data: &'a sensors::SensorsData, refresh_rate: &'a Duration) -> Self {
-        SmUi { data, refresh_rate }
-    }
-
-    fn draw_system_temperatures(&self, area: Rect, buf: &mut Buffer, block: Block<'_>) {
-        let temps = &self.data.temps;
-        if temps.is_empty() {
-            Widget::render(block, area, buf);
-            return;
-        }
-
-        let header = Row::new(vec![
-            header_cell("Chip / Sensor".to_string()),
-            header_cell("Current".to_string()),
-            header_cell("High".to_string()).dim(),
-            header_cell("Critical".to_string()).dim(),
-        ])
-        .height(1)
-        .bottom_margin(1);
-
-        let mut rows: Vec<Row> = vec![];
-        let mut last_chip_id: Option<String> = None;
-
-        for temp in temps {
-            let row = Row::new(vec![
-                cell_chip(temp.chip_label.clone(), temp.sensor_label.clone()),
-                get_colored_temp(&temp.value, &temp.high),
-                cell_value(val_temp(&temp.high)).dim(),
-                cell_value(val_temp(&temp.critical)).dim(),
-            ])
-            .top_margin(row_margin_top(&last_chip_id, &temp.chip_id));
-
-            rows.push(row);
-
-            last_chip_id = Some(temp.chip_id.clone());
-        }
-
-        let temp_table = Table::new(rows, [Fill(2), Fill(1), Fill(1), Fill(1)])
-            .header(header)
-            .block(block)
-            .column_spacing(TABLE_COLUMN_SPACING);
-
-        Widget::render(temp_table, area, buf);
-    }
-
-    fn draw_fans_table(&self, area: Rect, buf: &mut Buffer, block: Block<'_>) {
-        let fans = &self.data.fans;
-        if fans.is_empty() {
-            Widget::render(block, area, buf);
-            return;
-        }
-
-        let mut rows = vec![];
-        let mut last_chip_id: Option<String> = None;
-
-        let header = Row::new(vec![
-            header_cell("Fan".to_string()),
-            header_cell("Current".to_string()),
-            header_cell("Min".to_string()).dim(),
-        ])
-        .height(1)
-        .bottom_margin(1);
-
-        for fan in fans {
-            let row = Row::new(vec![
-                cell_chip(fan.chip_label.clone(), fan.sensor_label.clone()),
-                cell_current_value(val_rpm(&(&fan.value))),
-                cell_value(val_rpm(&(&fan.min))).dim(),
-            ])
-            .top_margin(row_margin_top(&last_chip_id, &fan.chip_id));
-            rows.push(row);
-            last_chip_id = Some(fan.chip_id.clone());
-        }
-
-        let fans_table = Table::new(rows, [Fill(2), Fill(1), Fill(1)])
-            .header(header)
-            .block(block)
-            .column_spacing(TABLE_COLUMN_SPACING);
-
-        Widget::render(fans_table, area, buf);
-    }
-
-    fn draw_hdd_temp_table(&self, area: Rect, buf: &mut Buffer, block: Block<'_>) {
-        let hdd_temps = &self.data.hdd_temps;
-        if hdd_temps.is_empty() {
-            Widget::render(block, area, buf);
-            return;
-        }
-
-        let mut rows = vec![];
-
-        let header = Row::new(vec![
-            header_cell("Drive".to_string()),
-            header_cell("Current".to_string()),
-            header_cell("High".to_string()).dim(),
-            header_cell("Critical".to_string()).dim(),
-            header_cell("Lowest".to_string()).dim(),
-            header_cell("Highest".to_string()).dim(),
-        ])
-        .height(1)
-        .bottom_margin(1);
-
-        for temp in hdd_temps {
-            let row = Row::new(vec![
-                cell_chip(temp.chip_label.clone(), temp.sensor_label.clone()),
-                get_colored_temp(&temp.value, &temp.high),
-                cell_value(val_temp(&temp.high)).dim(),
-                cell_value(val_temp(&temp.critical)).dim(),
-                cell_value(val_temp(&temp.lowest)).dim(),
-                cell_value(val_temp(&temp.highest)).dim(),
-            ]);
-            rows.push(row);
-        }
-
-        let hdd_temp_table =
-            Table::new(rows, [Fill(3), Fill(1), Fill(1), Fill(1), Fill(1), Fill(1)])
-                .header(header)
-                .block(block)
-                .column_spacing(TABLE_COLUMN_SPACING);
-
-        Widget::render(hdd_temp_table, area, buf);
-    }
-
-    fn draw_voltage_table(&self, area: Rect, buf: &mut Buffer, block: Block<'_>) {
-        let voltages = &self.data.volts;
-        if voltages.is_empty() {
-            Widget::render(block, area, buf);
-            return;
-        }
-
-        let header = Row::new(vec![
-            header_cell("Chip / Sensor".to_string()),
-            header_cell("Current".to_string()),
-            header_cell("Min".to_string()).dim(),
-            header_cell("Max".to_string()).dim(),
-        ])
-        .height(1)
-        .bottom_margin(1);
-
-        let mut rows = vec![];
-        let mut last_chip_id: Option<String> = None;
-        for volt in voltages {
-            let row = Row::new(vec![
-                cell_chip(volt.chip_label.clone(), volt.sensor_label.clone()),
-                get_colored_voltage(&volt.value, &volt.min, &volt.max),
-                cell_value(val_volts(&volt.min)).dim(),
-                cell_value(val_volts(&volt.max)).dim(),
-            ])
-            .top_margin(row_margin_top(&last_chip_id, &volt.chip_id));
-
-            rows.push(row);
-            last_chip_id = Some(volt.chip_id.clone());
+    pub fn new(
+        tables: &'a SmTables,
+        refresh_rate: &'a Duration,
+        config_error: Option<&'a str>,
+    ) -> Self {
+        SmUi {
+            tables,
+            refresh_rate,
+            config_error,
         }
-
-        let voltage_table = Table::new(rows, [Fill(2), Fill(1), Fill(1), Fill(1)])
-            .header(header)
-            .block(block)
-            .column_spacing(TABLE_COLUMN_SPACING);
-
-        Widget::render(voltage_table, area, buf);
     }
 }